@@ -0,0 +1,200 @@
+"""업로드 CSV 사전 품질 검사 + 기준 통계(reference_stats.pkl) 생성
+
+기준 통계 생성 (참조/학습 코호트 CSV: 200개 유전자 컬럼 포함):
+    python data_quality.py reference.csv --quantiles 0.001 0.999
+
+reference_stats.pkl : index = 유전자, columns = median, lower, upper
+"""
+
+import argparse
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------
+# 설정
+# -------------------------------------------------------
+# 학습 코호트 기준 통계 (index: 유전자, columns: median[, lower, upper])
+REFERENCE_STATS_PATH = "reference_stats.pkl"
+CHUNK_SIZE = 5000
+RANGE_QUANTILES = (0.001, 0.999)  # 정상 범위(lower, upper)로 쓰는 분위수
+
+ISSUE_COLUMNS = ["Missing", "Non_Numeric", "Non_Finite", "Out_Of_Range"]
+
+
+@dataclass
+class QualityReport:
+    """유전자 컬럼별 데이터 품질 집계"""
+
+    n_rows: int
+    counts: pd.DataFrame  # index: 유전자, columns: ISSUE_COLUMNS
+
+    @property
+    def totals(self) -> pd.Series:
+        return self.counts.sum()
+
+    @property
+    def imputable(self) -> int:
+        """median 대체 대상 (결측 + 숫자 아님 + inf)"""
+        t = self.totals
+        return int(t["Missing"] + t["Non_Numeric"] + t["Non_Finite"])
+
+    @property
+    def blocking(self) -> int:
+        """예측 전에 반드시 처리해야 하는 값 (숫자 아님 + inf)
+
+        단순 결측(NaN)은 StandardScaler / XGBoost가 그대로 처리하므로 포함하지 않음.
+        """
+        t = self.totals
+        return int(t["Non_Numeric"] + t["Non_Finite"])
+
+    @property
+    def has_issues(self) -> bool:
+        return int(self.totals.sum()) > 0
+
+    def problem_columns(self) -> pd.DataFrame:
+        """문제가 하나라도 있는 컬럼만 (문제 수 내림차순)"""
+        bad = self.counts[self.counts.sum(axis=1) > 0]
+        order = bad.sum(axis=1).sort_values(ascending=False).index
+        return bad.loc[order]
+
+
+def load_reference_stats(path: str = REFERENCE_STATS_PATH) -> Optional[pd.DataFrame]:
+    """기준 통계 파일 로드 (없으면 None)"""
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+
+def read_header(source) -> List[str]:
+    """CSV 헤더만 읽고 파일 포인터를 처음으로 되돌림"""
+    columns = pd.read_csv(source, nrows=0).columns.tolist()
+    source.seek(0)
+    return columns
+
+
+def scan_csv(
+    source,
+    feature_cols: List[str],
+    reference: Optional[pd.DataFrame] = None,
+    chunksize: int = CHUNK_SIZE,
+) -> Tuple[pd.DataFrame, QualityReport]:
+    """CSV를 chunk 단위로 읽으면서 유전자 컬럼을 숫자로 변환하고 문제 개수를 집계
+
+    반환되는 DataFrame의 유전자 컬럼은 float이며, 숫자가 아닌 값은 NaN으로 바뀜.
+    """
+    n_features = len(feature_cols)
+    counts = np.zeros((len(ISSUE_COLUMNS), n_features), dtype=np.int64)
+
+    lower = upper = None
+    if reference is not None and {"lower", "upper"}.issubset(reference.columns):
+        lower = reference["lower"].reindex(feature_cols).to_numpy(dtype=float)
+        upper = reference["upper"].reindex(feature_cols).to_numpy(dtype=float)
+
+    chunks = []
+    n_rows = 0
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        raw = chunk[feature_cols]
+        numeric = raw.apply(pd.to_numeric, errors="coerce")
+
+        values = numeric.to_numpy(dtype=float)
+        raw_null = raw.isna().to_numpy()
+        is_nan = np.isnan(values)
+        is_inf = np.isinf(values)
+
+        counts[0] += raw_null.sum(axis=0)
+        counts[1] += (is_nan & ~raw_null).sum(axis=0)
+        counts[2] += is_inf.sum(axis=0)
+        if lower is not None:
+            # NaN과의 비교는 False이므로 기준값이 없는 유전자는 자동으로 제외됨
+            with np.errstate(invalid="ignore"):
+                out = (values < lower) | (values > upper)
+            counts[3] += (out & ~is_inf).sum(axis=0)
+
+        chunk[feature_cols] = numeric
+        chunks.append(chunk)
+        n_rows += len(chunk)
+
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    report = QualityReport(
+        n_rows=n_rows,
+        counts=pd.DataFrame(counts.T, index=feature_cols, columns=ISSUE_COLUMNS),
+    )
+    return df, report
+
+
+def impute_medians(
+    df: pd.DataFrame,
+    feature_cols: List[str],
+    reference: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """NaN / ±inf 값을 기준 median으로 대체 (기준 통계가 없으면 업로드 코호트 median)"""
+    df = df.copy()
+    values = df[feature_cols].replace([np.inf, -np.inf], np.nan)
+
+    if reference is not None and "median" in reference.columns:
+        medians = reference["median"].reindex(feature_cols)
+        # 기준값이 없는 유전자는 코호트 median으로 채움
+        medians = medians.fillna(values.median())
+    else:
+        medians = values.median()
+
+    df[feature_cols] = values.fillna(medians)
+    return df
+
+
+def build_reference_stats(
+    reference: pd.DataFrame,
+    feature_cols: List[str],
+    quantiles: Tuple[float, float] = RANGE_QUANTILES,
+    path: str = REFERENCE_STATS_PATH,
+) -> pd.DataFrame:
+    """참조 코호트로 유전자별 median / lower / upper를 계산해서 저장"""
+    values = (
+        reference[feature_cols]
+        .apply(pd.to_numeric, errors="coerce")
+        .replace([np.inf, -np.inf], np.nan)
+    )
+    q = values.quantile(list(quantiles))
+    stats = pd.DataFrame(
+        {
+            "median": values.median(),
+            "lower": q.iloc[0],
+            "upper": q.iloc[1],
+        }
+    )
+    joblib.dump(stats, path)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build reference_stats.pkl")
+    parser.add_argument("reference_csv")
+    parser.add_argument(
+        "--quantiles",
+        type=float,
+        nargs=2,
+        default=list(RANGE_QUANTILES),
+        metavar=("LOWER", "UPPER"),
+    )
+    parser.add_argument("--output", default=REFERENCE_STATS_PATH)
+    args = parser.parse_args()
+
+    feature_cols = joblib.load("feature_cols.pkl")
+    reference = pd.read_csv(args.reference_csv)
+    stats = build_reference_stats(
+        reference,
+        feature_cols,
+        quantiles=tuple(args.quantiles),
+        path=args.output,
+    )
+    print(f"Wrote median/lower/upper for {len(stats)} genes → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+"""streamlit_app.py 동시 세션 부하 테스트
+
+사용 예:
+    python load_test.py --sessions 1 2 4 8 --patients 300 --rounds 3
+
+headless `streamlit run` 서버를 하나 띄우고, 세션 수만큼 websocket client를 동시에 붙여서
+브라우저와 같은 BackMsg / ForwardMsg 프로토콜로 앱을 조작함. 세션마다 서버 쪽
+session_id가 다르므로 scoring 큐의 세션별 round-robin도 실제로 동작함.
+
+각 세션은 round마다 다음을 반복:
+    page_load   : 첫 접속 (업로드 전 스크립트 실행)
+    upload_cold : 새 합성 코호트를 업로드 endpoint로 PUT 후 rerun (검증 + 예측 + 시각화)
+    search      : Patient_ID 검색 입력 → rerun
+    history     : Result History 탭에서 저장된 batch 선택 → rerun
+    download    : 결과 CSV를 media URL에서 내려받고, 버튼 클릭 trigger로 rerun
+    upload_warm : 같은 코호트를 새 세션에서 다시 업로드 (결과 저장소 hit, 예측 생략)
+
+참고:
+    - 탭 전환 자체는 브라우저에서만 일어나고 스크립트를 다시 실행하지 않으므로,
+      탭 안의 위젯 조작(search/history)이 서버 부하로 측정됨
+    - 서버는 임시 디렉터리의 별도 결과 저장소(MM_RESULT_STORE)를 사용하므로 실제 이력에 영향 없음
+    - peak_rss_mb는 각 level 동안 서버 프로세스 RSS를 주기적으로 읽은 최대값
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.Selectbox_pb2 import Selectbox
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import AsyncHTTPClient, HTTPClient, HTTPRequest
+from tornado.websocket import websocket_connect
+
+from result_store import RESULT_STORE_ENV
+
+
+APP_PATH = "streamlit_app.py"
+INTERACTIONS = [
+    "page_load",
+    "upload_cold",
+    "search",
+    "history",
+    "download",
+    "upload_warm",
+]
+SAMPLE_INTERVAL_S = 0.2
+
+UPLOAD_LABEL = "Upload CSV file with gene expression data"
+SEARCH_LABEL = "🔍 Search Patient ID"
+HISTORY_LABEL = "Select a saved batch"
+DOWNLOAD_LABEL = "📥 Download Prediction Results (CSV)"
+
+
+def make_cohort(feature_cols: List[str], n_patients: int, seed: int) -> bytes:
+    """feature_cols 기준 합성 유전자 발현 CSV (log2 발현 수준 정도의 값)"""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(loc=8.0, scale=2.0, size=(n_patients, len(feature_cols)))
+    return pd.DataFrame(values, columns=feature_cols).to_csv(index=False).encode("utf-8")
+
+
+# -------------------------------------------------------
+# Streamlit 서버
+# -------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, store_path: str, log_path: str) -> subprocess.Popen:
+    env = dict(os.environ, **{RESULT_STORE_ENV: store_path})
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "streamlit",
+                "run",
+                APP_PATH,
+                "--server.headless=true",
+                f"--server.port={port}",
+                "--server.address=127.0.0.1",
+                "--server.enableXsrfProtection=false",
+                "--server.enableCORS=false",
+                "--server.fileWatcherType=none",
+                "--browser.gatherUsageStats=false",
+            ],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+    client = HTTPClient()
+    deadline = time.monotonic() + 60
+    try:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"streamlit server exited, see {log_path}")
+            try:
+                client.fetch(f"http://127.0.0.1:{port}/_stcore/health")
+                return proc
+            except Exception:
+                time.sleep(0.5)
+    finally:
+        client.close()
+    proc.terminate()
+    raise RuntimeError(f"streamlit server did not become healthy, see {log_path}")
+
+
+class RssSampler:
+    """별도 thread에서 /proc/<pid>/statm을 읽어 구간별 최대 RSS(MB)를 기록"""
+
+    def __init__(self, pid: int):
+        self.path = f"/proc/{pid}/statm"
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _read(self) -> int:
+        with open(self.path) as f:
+            return int(f.read().split()[1]) * self.page_size
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.peak = max(self.peak, self._read())
+            except OSError:
+                return
+            self._stop.wait(SAMPLE_INTERVAL_S)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / (1024 * 1024)
+
+
+# -------------------------------------------------------
+# websocket 세션 client
+# -------------------------------------------------------
+class SessionClient:
+    """브라우저 탭 하나에 해당하는 Streamlit 세션"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.http = AsyncHTTPClient()
+        self.ws = None
+        self.session_id: Optional[str] = None
+        self.page_script_hash = ""
+        self.widgets: Dict[str, object] = {}  # label → 마지막 run의 widget proto
+        self.states: Dict[str, WidgetState] = {}  # widget id → 보낼 상태
+        self._exceptions: List[str] = []
+
+    async def connect(self) -> None:
+        ws_url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = await websocket_connect(ws_url, subprotocols=["streamlit"])
+
+    def close(self) -> None:
+        if self.ws is not None:
+            self.ws.close()
+
+    async def _send(self, msg: BackMsg) -> None:
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+    async def _recv(self) -> ForwardMsg:
+        data = await self.ws.read_message()
+        if data is None:
+            raise ConnectionError("websocket closed by server")
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+
+        kind = msg.WhichOneof("type")
+        if kind == "new_session":
+            self.session_id = msg.new_session.initialize.session_id
+            self.page_script_hash = msg.new_session.page_script_hash
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            proto = getattr(element, element_type) if element_type else None
+            if element_type == "exception":
+                self._exceptions.append(proto.message)
+            elif proto is not None and hasattr(proto, "id") and hasattr(proto, "label"):
+                self.widgets[proto.label] = proto
+        return msg
+
+    async def rerun(self) -> List[str]:
+        """현재 widget 상태로 스크립트를 실행하고 끝날 때까지 대기, 앱 예외 메시지 반환"""
+        self._exceptions = []
+        self.widgets = {}
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = self.page_script_hash
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        await self._send(msg)
+
+        async def wait_finished() -> None:
+            while True:
+                fwd = await self._recv()
+                if (
+                    fwd.WhichOneof("type") == "script_finished"
+                    and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN
+                ):
+                    return
+
+        await asyncio.wait_for(wait_finished(), self.timeout)
+        return self._exceptions
+
+    def widget(self, label: str):
+        if label not in self.widgets:
+            raise LookupError(f"widget not found: {label!r}")
+        return self.widgets[label]
+
+    def set_state(self, proto, **value) -> None:
+        state = WidgetState(id=proto.id, **value)
+        self.states[proto.id] = state
+
+    async def upload(self, label: str, data: bytes, name: str) -> List[str]:
+        """file_uploader와 같은 순서로 업로드 URL 요청 → PUT → widget 상태 설정 → rerun"""
+        uploader = self.widget(label)
+
+        request_id = uuid.uuid4().hex
+        msg = BackMsg()
+        msg.file_urls_request.request_id = request_id
+        msg.file_urls_request.file_names.append(name)
+        msg.file_urls_request.session_id = self.session_id
+        await self._send(msg)
+
+        async def wait_urls():
+            while True:
+                fwd = await self._recv()
+                if (
+                    fwd.WhichOneof("type") == "file_urls_response"
+                    and fwd.file_urls_response.response_id == request_id
+                ):
+                    return fwd.file_urls_response
+
+        response = await asyncio.wait_for(wait_urls(), self.timeout)
+        if response.error_msg:
+            raise RuntimeError(response.error_msg)
+        urls = response.file_urls[0]
+
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            "Content-Type: text/csv\r\n\r\n"
+        ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        await self.http.fetch(
+            HTTPRequest(
+                self._url(urls.upload_url),
+                method="PUT",
+                body=body,
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                request_timeout=self.timeout,
+            )
+        )
+
+        state = WidgetState(id=uploader.id)
+        file_state = state.file_uploader_state_value
+        file_state.max_file_size = uploader.max_upload_size_mb * 1024 * 1024
+        info = file_state.uploaded_file_info.add()
+        info.file_id = urls.file_id
+        info.name = name
+        info.size = len(data)
+        info.file_urls.CopyFrom(urls)
+        self.states[uploader.id] = state
+        return await self.rerun()
+
+    async def download(self, label: str) -> List[str]:
+        """download_button의 media URL을 내려받고, 클릭 trigger로 rerun"""
+        button = self.widget(label)
+        await self.http.fetch(self._url(button.url), request_timeout=self.timeout)
+
+        self.set_state(button, trigger_value=True)
+        try:
+            return await self.rerun()
+        finally:
+            # trigger 값은 한 번의 rerun에만 유효
+            self.states.pop(button.id, None)
+
+    def _url(self, path: str) -> str:
+        return path if path.startswith("http") else self.base_url + path
+
+
+def select_first_option(client: SessionClient, label: str) -> None:
+    proto = client.widget(label)
+    if not proto.options:
+        raise LookupError(f"no options in {label!r}")
+    # 최근 버전의 selectbox는 선택된 옵션 문자열, 이전 버전은 index를 widget 값으로 사용
+    if "accept_new_options" in Selectbox.DESCRIPTOR.fields_by_name:
+        client.set_state(proto, string_value=proto.options[0])
+    else:
+        client.set_state(proto, int_value=0)
+
+
+# -------------------------------------------------------
+# 세션 시뮬레이션
+# -------------------------------------------------------
+async def _timed(
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, List[str]],
+    name: str,
+    coro,
+) -> bool:
+    """상호작용 시간을 기록하고 성공 여부 반환 (실패는 상호작용별로 기록)"""
+    start = time.perf_counter()
+    try:
+        exceptions = await coro
+    except Exception as e:
+        errors[name].append(f"{type(e).__name__}: {e}")
+        return False
+    latencies[name].append(time.perf_counter() - start)
+    if exceptions:
+        errors[name].append(exceptions[0])
+        return False
+    return True
+
+
+async def _open_session(
+    base_url: str,
+    timeout: float,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, List[str]],
+) -> Optional[SessionClient]:
+    client = SessionClient(base_url, timeout)
+    try:
+        await client.connect()
+    except Exception as e:
+        errors["page_load"].append(f"{type(e).__name__}: {e}")
+        return None
+    if not await _timed(latencies, errors, "page_load", client.rerun()):
+        client.close()
+        return None
+    return client
+
+
+async def run_session(
+    base_url: str,
+    feature_cols: List[str],
+    n_patients: int,
+    seed: int,
+    rounds: int,
+    timeout: float,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, List[str]],
+) -> None:
+    for r in range(rounds):
+        # round마다 새 코호트 → upload_cold는 항상 실제 예측을 거침
+        cohort = make_cohort(feature_cols, n_patients, seed + r)
+        name = f"synthetic_cohort_{seed + r}.csv"
+
+        client = await _open_session(base_url, timeout, latencies, errors)
+        if client is None:
+            continue
+        try:
+            if not await _timed(
+                latencies, errors, "upload_cold", client.upload(UPLOAD_LABEL, cohort, name)
+            ):
+                continue
+
+            try:
+                client.set_state(client.widget(SEARCH_LABEL), string_value="MM-001")
+                await _timed(latencies, errors, "search", client.rerun())
+            except LookupError as e:
+                errors["search"].append(str(e))
+
+            try:
+                select_first_option(client, HISTORY_LABEL)
+                await _timed(latencies, errors, "history", client.rerun())
+            except LookupError as e:
+                errors["history"].append(str(e))
+
+            try:
+                await _timed(
+                    latencies, errors, "download", client.download(DOWNLOAD_LABEL)
+                )
+            except LookupError as e:
+                errors["download"].append(str(e))
+        finally:
+            client.close()
+
+        # 같은 코호트를 새 세션(새 탭)에서 다시 업로드 → 결과 저장소 hit
+        client = await _open_session(base_url, timeout, defaultdict(list), errors)
+        if client is None:
+            continue
+        try:
+            await _timed(
+                latencies, errors, "upload_warm", client.upload(UPLOAD_LABEL, cohort, name)
+            )
+        finally:
+            client.close()
+
+
+async def _warm_up(base_url: str, timeout: float) -> None:
+    errors: Dict[str, List[str]] = defaultdict(list)
+    client = await _open_session(base_url, timeout, defaultdict(list), errors)
+    if client is None:
+        raise RuntimeError(f"warm-up failed: {errors['page_load']}")
+    client.close()
+
+
+async def _run_sessions(
+    n_sessions: int,
+    base_url: str,
+    feature_cols: List[str],
+    n_patients: int,
+    rounds: int,
+    timeout: float,
+    seed: int,
+) -> tuple:
+    per_session = [defaultdict(list) for _ in range(n_sessions)]
+    per_session_errors = [defaultdict(list) for _ in range(n_sessions)]
+    await asyncio.gather(
+        *(
+            run_session(
+                base_url,
+                feature_cols,
+                n_patients,
+                seed + i * rounds,  # 세션/round마다 다른 seed → 서로 다른 코호트
+                rounds,
+                timeout,
+                per_session[i],
+                per_session_errors[i],
+            )
+            for i in range(n_sessions)
+        )
+    )
+    return per_session, per_session_errors
+
+
+def run_level(
+    n_sessions: int,
+    base_url: str,
+    server_pid: int,
+    feature_cols: List[str],
+    n_patients: int,
+    rounds: int,
+    timeout: float,
+    seed: int,
+) -> Dict[str, object]:
+    """n_sessions개 세션을 동시에 실행하고 상호작용별 latency 통계를 반환"""
+    start = time.perf_counter()
+    with RssSampler(server_pid) as rss:
+        per_session, per_session_errors = asyncio.run(
+            _run_sessions(
+                n_sessions, base_url, feature_cols, n_patients, rounds, timeout, seed
+            )
+        )
+    wall = time.perf_counter() - start
+
+    row: Dict[str, object] = {"sessions": n_sessions}
+    total = 0
+    for name in INTERACTIONS:
+        samples = np.array([x for s in per_session for x in s[name]])
+        total += len(samples)
+        if len(samples):
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = np.nan
+        row[f"{name}_p50"] = p50
+        row[f"{name}_p95"] = p95
+        row[f"{name}_p99"] = p99
+        row[f"{name}_errors"] = sum(len(e[name]) for e in per_session_errors)
+
+    row["throughput_per_s"] = total / wall if wall > 0 else np.nan
+    row["peak_rss_mb"] = rss.peak_mb
+    for name in INTERACTIONS:
+        messages = [m for e in per_session_errors for m in e[name]]
+        if messages:
+            print(
+                f"[{n_sessions} sessions] {name}: {len(messages)} errors, "
+                f"first: {messages[0]}",
+                file=sys.stderr,
+            )
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--csv", help="결과 표를 CSV로 저장할 경로")
+    args = parser.parse_args()
+
+    feature_cols = joblib.load("feature_cols.pkl")
+    seed = args.seed if args.seed is not None else int(time.time())
+
+    work_dir = tempfile.TemporaryDirectory(prefix="mm_load_test_")
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(
+        port,
+        os.path.join(work_dir.name, "results.db"),
+        os.path.join(work_dir.name, "server.log"),
+    )
+
+    try:
+        # 모델 로드 / cache_resource 초기화는 측정에서 제외
+        asyncio.run(_warm_up(base_url, args.timeout))
+
+        rows = []
+        for i, n in enumerate(args.sessions):
+            row = run_level(
+                n,
+                base_url,
+                server.pid,
+                feature_cols,
+                args.patients,
+                args.rounds,
+                args.timeout,
+                seed + i * 10_000,
+            )
+            rows.append(row)
+            print(
+                f"{n:>3} sessions · cold upload p95 {row['upload_cold_p95']:.2f}s · "
+                f"{row['throughput_per_s']:.2f} interactions/s · "
+                f"peak RSS {row['peak_rss_mb']:.0f} MB"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+        work_dir.cleanup()
+
+    report = pd.DataFrame(rows)
+    print()
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
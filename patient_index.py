@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------
+# 위험군 서브탭 구성 (탭 이름 → 포함되는 Risk_Group)
+# -------------------------------------------------------
+RISK_TIERS: Dict[str, Tuple[str, ...]] = {
+    "high": ("High Risk", "Very High Risk"),
+    "medium": ("Medium Risk",),
+    "low": ("Low Risk", "Very Low Risk"),
+}
+
+TABLE_COLUMNS = ["Patient_ID", "Risk_Score", "Survival_Rate", "Risk_Group"]
+
+
+@dataclass
+class PatientIndex:
+    """위험군/점수 순으로 한 번만 정렬된 환자 테이블 + 조회용 인덱스"""
+
+    table: pd.DataFrame
+    offsets: Dict[str, Tuple[int, int]]
+    id_lookup: Dict[str, int]
+
+    def tier(self, name: str) -> pd.DataFrame:
+        """서브탭용 슬라이스 (재정렬 없이 offset 구간만 잘라냄)"""
+        start, end = self.offsets[name]
+        return self.table.iloc[start:end]
+
+    def count(self, name: str) -> int:
+        start, end = self.offsets[name]
+        return end - start
+
+    def lookup(self, patient_id: str) -> Optional[pd.DataFrame]:
+        """Patient_ID로 환자 한 명 조회 (없으면 None)"""
+        pos = self.id_lookup.get(str(patient_id).strip())
+        if pos is None:
+            return None
+        return self.table.iloc[pos : pos + 1]
+
+
+def build_patient_index(result_df: pd.DataFrame) -> PatientIndex:
+    """result_df를 (위험군 tier, Risk_Score 내림차순)으로 한 번에 정렬·포맷"""
+    tier_names = list(RISK_TIERS)
+    group_to_code = {
+        group: code
+        for code, name in enumerate(tier_names)
+        for group in RISK_TIERS[name]
+    }
+
+    # 어느 tier에도 속하지 않는 Risk_Group은 맨 뒤로 보냄 (서브탭에는 표시 안 됨)
+    codes = (
+        result_df["Risk_Group"]
+        .map(group_to_code)
+        .fillna(len(tier_names))
+        .to_numpy(dtype=np.int64)
+    )
+    scores = result_df["Risk_Score"].to_numpy(dtype=float)
+
+    # lexsort: 마지막 key가 1순위 → tier 오름차순, 점수 내림차순
+    order = np.lexsort((-scores, codes))
+    sorted_codes = codes[order]
+
+    bounds = np.searchsorted(sorted_codes, np.arange(len(tier_names) + 1))
+    offsets = {
+        name: (int(bounds[i]), int(bounds[i + 1]))
+        for i, name in enumerate(tier_names)
+    }
+
+    table = result_df[TABLE_COLUMNS].iloc[order].reset_index(drop=True)
+    table["Patient_ID"] = table["Patient_ID"].astype(str)
+    table["Risk_Score"] = table["Risk_Score"].map("{:.3f}".format)
+    table["Survival_Rate"] = table["Survival_Rate"].map("{:.1f}%".format)
+
+    # 중복 ID는 가장 먼저 나온(점수가 높은) 행을 사용 → 역순으로 넣어서 앞쪽 값이 남도록
+    ids = table["Patient_ID"].to_numpy()
+    id_lookup: Dict[str, int] = dict(zip(ids[::-1], range(len(ids) - 1, -1, -1)))
+
+    return PatientIndex(table=table, offsets=offsets, id_lookup=id_lookup)
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Iterable, Optional
+
+import pandas as pd
+
+
+# -------------------------------------------------------
+# 설정
+# -------------------------------------------------------
+RESULT_STORE_PATH = "mm_results.db"
+RESULT_STORE_ENV = "MM_RESULT_STORE"  # 설정 시 기본 경로 대신 사용 (부하 테스트 등)
+MAX_BATCHES: Optional[int] = 200  # 보관할 최대 batch 수 (None이면 제한 없음)
+MAX_AGE_DAYS: Optional[float] = None  # 보관 기간 (None이면 제한 없음)
+
+RESULT_COLUMNS = ["Patient_ID", "Risk_Score", "Risk_Group", "Survival_Rate"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash  TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    variant       TEXT NOT NULL,
+    file_name     TEXT,
+    n_patients    INTEGER NOT NULL,
+    created_at    REAL NOT NULL,
+    UNIQUE (content_hash, model_version, variant)
+);
+CREATE TABLE IF NOT EXISTS results (
+    batch_id      INTEGER NOT NULL REFERENCES batches(batch_id) ON DELETE CASCADE,
+    row_no        INTEGER NOT NULL,
+    Patient_ID    TEXT,
+    Risk_Score    REAL,
+    Risk_Group    TEXT,
+    Survival_Rate REAL,
+    PRIMARY KEY (batch_id, row_no)
+);
+"""
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(paths: Iterable[str]) -> str:
+    """모델 파일들의 내용으로 model version 문자열 생성"""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:12]
+
+
+class ResultStore:
+    """예측 결과를 (업로드 내용 hash, model version, variant) 단위로 SQLite에 보관"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_batches: Optional[int] = MAX_BATCHES,
+        max_age_days: Optional[float] = MAX_AGE_DAYS,
+    ):
+        if path is None:
+            path = os.environ.get(RESULT_STORE_ENV, RESULT_STORE_PATH)
+        self.path = path
+        self.max_batches = max_batches
+        self.max_age_days = max_age_days
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # 세션(스레드)마다 호출되므로 매번 새 connection 사용
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def load(
+        self, content_hash: str, model_version: str, variant: str = "raw"
+    ) -> Optional[pd.DataFrame]:
+        """저장된 결과가 있으면 DataFrame으로 반환, 없으면 None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT batch_id FROM batches "
+                "WHERE content_hash = ? AND model_version = ? AND variant = ?",
+                (content_hash, model_version, variant),
+            ).fetchone()
+            if row is None:
+                return None
+            return self.load_batch(row[0], conn)
+
+    def load_batch(
+        self, batch_id: int, conn: Optional[sqlite3.Connection] = None
+    ) -> pd.DataFrame:
+        query = (
+            f"SELECT {', '.join(RESULT_COLUMNS)} FROM results "
+            "WHERE batch_id = ? ORDER BY row_no"
+        )
+        if conn is not None:
+            return pd.read_sql_query(query, conn, params=(batch_id,))
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=(batch_id,))
+
+    def save(
+        self,
+        content_hash: str,
+        model_version: str,
+        result_df: pd.DataFrame,
+        variant: str = "raw",
+        file_name: Optional[str] = None,
+    ) -> None:
+        rows = result_df[RESULT_COLUMNS].astype(
+            {"Patient_ID": str, "Risk_Score": float, "Survival_Rate": float}
+        )
+        with closing(self._connect()) as conn, conn:
+            # 같은 key로 다시 저장하면 이전 결과를 교체 (results는 CASCADE 삭제)
+            conn.execute(
+                "DELETE FROM batches "
+                "WHERE content_hash = ? AND model_version = ? AND variant = ?",
+                (content_hash, model_version, variant),
+            )
+            cur = conn.execute(
+                "INSERT INTO batches "
+                "(content_hash, model_version, variant, file_name, n_patients, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    content_hash,
+                    model_version,
+                    variant,
+                    file_name,
+                    len(rows),
+                    time.time(),
+                ),
+            )
+            batch_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO results "
+                f"(batch_id, row_no, {', '.join(RESULT_COLUMNS)}) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (batch_id, i, *values)
+                    for i, values in enumerate(rows.itertuples(index=False))
+                ),
+            )
+        self.evict()
+
+    def history(self) -> pd.DataFrame:
+        """저장된 batch 목록 (최신순)"""
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(
+                "SELECT batch_id, file_name, n_patients, model_version, variant, "
+                "created_at FROM batches ORDER BY created_at DESC",
+                conn,
+            )
+        df["created_at"] = pd.to_datetime(df["created_at"], unit="s")
+        return df
+
+    def evict(self) -> int:
+        """기간/개수 제한을 넘는 오래된 batch 삭제, 삭제된 batch 수 반환"""
+        removed = 0
+        with closing(self._connect()) as conn, conn:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += conn.execute(
+                    "DELETE FROM batches WHERE created_at < ?", (cutoff,)
+                ).rowcount
+            if self.max_batches is not None:
+                removed += conn.execute(
+                    "DELETE FROM batches WHERE batch_id NOT IN ("
+                    "SELECT batch_id FROM batches "
+                    "ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_batches,),
+                ).rowcount
+        return removed
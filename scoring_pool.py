@@ -0,0 +1,149 @@
+import copy
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+
+# -------------------------------------------------------
+# 설정
+# -------------------------------------------------------
+MAX_WORKERS = 2  # 동시에 실행되는 예측 작업 수
+WAIT_HISTORY = 50  # 평균 대기시간 계산에 쓰는 최근 작업 수
+
+
+class _Job:
+    __slots__ = ("X", "future", "enqueued_at")
+
+    def __init__(self, X: np.ndarray):
+        self.X = X
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class ScoringScheduler:
+    """모든 세션이 공유하는 예측 작업 큐 + 고정 크기 worker pool
+
+    - 세션별 큐를 round-robin으로 돌면서 꺼내므로 큰 업로드가 다른 세션을 막지 않음
+    - worker마다 n_jobs=threads_per_job으로 설정된 모델 사본을 사용해 CPU 과점유 방지
+    """
+
+    def __init__(
+        self,
+        model,
+        max_workers: int = MAX_WORKERS,
+        threads_per_job: Optional[int] = None,
+    ):
+        self.max_workers = max_workers
+        self.threads_per_job = threads_per_job or max(
+            1, (os.cpu_count() or 1) // max_workers
+        )
+
+        self._queues: Dict[str, Deque[_Job]] = {}
+        self._rotation: Deque[str] = deque()
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_HISTORY)
+
+        for i in range(max_workers):
+            worker_model = copy.deepcopy(model)
+            worker_model.set_params(n_jobs=self.threads_per_job)
+            threading.Thread(
+                target=self._worker,
+                args=(worker_model,),
+                name=f"scoring-worker-{i}",
+                daemon=True,
+            ).start()
+
+    def submit(self, session_id: str, X: np.ndarray) -> Future:
+        """예측 작업을 세션 큐에 추가, Future.result()는 양성 클래스 확률 배열"""
+        job = _Job(X)
+        with self._cond:
+            if session_id not in self._queues:
+                self._queues[session_id] = deque()
+                self._rotation.append(session_id)
+            self._queues[session_id].append(job)
+            self._cond.notify()
+        return job.future
+
+    def predict_proba(self, session_id: str, X: np.ndarray) -> np.ndarray:
+        return self.submit(session_id, X).result()
+
+    def cancel(self, future: Future) -> bool:
+        """대기 중인 작업을 취소하고 큐에서 제거 (이미 실행 중/완료면 False)"""
+        with self._cond:
+            if not future.cancel():
+                return False
+            for session_id, queue in list(self._queues.items()):
+                for job in queue:
+                    if job.future is future:
+                        queue.remove(job)
+                        if not queue:
+                            del self._queues[session_id]
+                            self._rotation.remove(session_id)
+                        return True
+            return True
+
+    def position(self, future: Future) -> Optional[int]:
+        """대기 중인 작업 앞에 먼저 실행될 작업 수 (round-robin 기준), 대기 중이 아니면 None"""
+        with self._cond:
+            rotation = list(self._rotation)
+            for r, session_id in enumerate(rotation):
+                queue = self._queues[session_id]
+                for i, job in enumerate(queue):
+                    if job.future is not future:
+                        continue
+                    # i번째 round 안에서 앞 순서 세션은 i+1개, 뒤 순서 세션은 i개가 먼저 실행됨
+                    ahead = i
+                    for r_other, other_id in enumerate(rotation):
+                        if r_other != r:
+                            served = i + 1 if r_other < r else i
+                            ahead += min(len(self._queues[other_id]), served)
+                    return ahead
+            return None
+
+    def stats(self) -> Dict[str, float]:
+        """UI 표시용 큐 상태"""
+        with self._cond:
+            queued = sum(len(q) for q in self._queues.values())
+            waits = list(self._waits)
+            return {
+                "queue_depth": queued,
+                "active_jobs": self._active,
+                "sessions_waiting": len(self._queues),
+                "avg_wait_s": float(np.mean(waits)) if waits else 0.0,
+                "max_wait_s": float(np.max(waits)) if waits else 0.0,
+            }
+
+    def _next_job(self) -> _Job:
+        # 호출 시 self._cond를 잡고 있어야 함
+        while not self._rotation:
+            self._cond.wait()
+        session_id = self._rotation.popleft()
+        queue = self._queues[session_id]
+        job = queue.popleft()
+        if queue:
+            self._rotation.append(session_id)  # 남은 작업은 다음 차례로
+        else:
+            del self._queues[session_id]
+        return job
+
+    def _worker(self, worker_model) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                self._active += 1
+                self._waits.append(time.monotonic() - job.enqueued_at)
+
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_result(worker_model.predict_proba(job.X)[:, 1])
+            except Exception as e:  # 세션 쪽 Future.result()에서 다시 발생
+                job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._active -= 1
@@ -0,0 +1,173 @@
+"""참조 코호트 환자와의 유전자 발현 유사도 인덱스
+
+인덱스 생성 (참조 CSV: 200개 유전자 + ID + 예후 컬럼):
+    python similarity_index.py reference.csv --id-col Patient_ID \\
+        --outcome-cols OS_Status OS_Months
+
+저장 형식 (reference_index/):
+    vectors.npy : 참조 코호트 기준 z-score 후 L2 정규화한 float32 행렬 (mmap으로 로드)
+    meta.pkl    : feature_cols, 유전자별 mean / std, 환자 ID, 예후(outcome) DataFrame
+
+query 시에도 같은 참조 mean / std로 정규화하므로, 환자의 이웃은 업로드에 함께 포함된
+다른 환자와 무관하게 결정됨.
+"""
+
+import argparse
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------
+# 설정
+# -------------------------------------------------------
+INDEX_DIR = "reference_index"
+MAX_BLOCK_BYTES = 256 * 1024 * 1024  # query block당 임시 메모리 최대 크기
+
+
+def reference_stats(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """참조 코호트의 유전자별 mean / std (std가 0이거나 NaN이면 1)"""
+    X = np.asarray(X, dtype=np.float64)
+    mean = np.nan_to_num(np.nanmean(X, axis=0))
+    std = np.nanstd(X, axis=0)
+    std[~(std > 0)] = 1.0
+    return mean, std
+
+
+def normalize_profiles(X: np.ndarray, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    """참조 mean / std로 z-score 후 행 단위 L2 정규화 → 내적 = cosine 유사도"""
+    X = np.asarray(X, dtype=np.float64)
+    Z = np.nan_to_num((X - mean) / std, posinf=0.0, neginf=0.0)  # 결측값은 평균(0)으로 취급
+    norms = np.linalg.norm(Z, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (Z / norms).astype(np.float32)
+
+
+@dataclass
+class SimilarityIndex:
+    vectors: np.ndarray  # (n_reference, n_features), float32, 정규화됨
+    feature_cols: List[str]
+    mean: np.ndarray  # 참조 코호트 유전자별 평균
+    std: np.ndarray  # 참조 코호트 유전자별 표준편차
+    ids: np.ndarray
+    outcomes: pd.DataFrame
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def query(
+        self,
+        cohort: pd.DataFrame,
+        query_ids: Sequence[str],
+        k: int = 5,
+    ) -> pd.DataFrame:
+        """업로드 코호트 전체의 top-k 이웃을 한 번에 계산
+
+        block마다 float32 유사도 행렬 + argpartition의 int64 index 행렬(원소당 12 bytes)이
+        MAX_BLOCK_BYTES를 넘지 않도록 query block 크기를 정하고, top-k만 남김.
+        """
+        Q = normalize_profiles(cohort[self.feature_cols].to_numpy(), self.mean, self.std)
+        n_ref = len(self)
+        k = min(k, n_ref)
+        block = max(1, MAX_BLOCK_BYTES // (12 * max(n_ref, 1)))
+
+        top_idx = np.empty((len(Q), k), dtype=np.int64)
+        top_sim = np.empty((len(Q), k), dtype=np.float32)
+        for start in range(0, len(Q), block):
+            sims = Q[start : start + block] @ self.vectors.T
+            # 부호를 뒤집은 복사본 없이 뒤쪽 k개(가장 큰 값)를 선택
+            idx = np.argpartition(sims, n_ref - k, axis=1)[:, -k:]
+            part = np.take_along_axis(sims, idx, axis=1)
+            order = np.argsort(-part, axis=1)
+            top_idx[start : start + block] = np.take_along_axis(idx, order, axis=1)
+            top_sim[start : start + block] = np.take_along_axis(part, order, axis=1)
+
+        flat = top_idx.ravel()
+        result = pd.DataFrame(
+            {
+                "Patient_ID": np.repeat(np.asarray(query_ids, dtype=str), k),
+                "Rank": np.tile(np.arange(1, k + 1), len(Q)),
+                "Reference_ID": self.ids[flat],
+                "Similarity": top_sim.ravel(),
+            }
+        )
+        outcomes = self.outcomes.iloc[flat].reset_index(drop=True)
+        return pd.concat([result, outcomes], axis=1)
+
+
+def build_index(
+    reference: pd.DataFrame,
+    feature_cols: List[str],
+    id_col: Optional[str] = None,
+    outcome_cols: Sequence[str] = (),
+    index_dir: str = INDEX_DIR,
+) -> SimilarityIndex:
+    """참조 코호트로 인덱스를 만들고 index_dir에 저장"""
+    os.makedirs(index_dir, exist_ok=True)
+
+    X = reference[feature_cols].to_numpy()
+    mean, std = reference_stats(X)
+    vectors = normalize_profiles(X, mean, std)
+    if id_col is not None:
+        ids = reference[id_col].astype(str).to_numpy()
+    else:
+        ids = np.array([f"REF-{i + 1}" for i in range(len(reference))])
+    outcomes = reference[list(outcome_cols)].reset_index(drop=True)
+
+    np.save(os.path.join(index_dir, "vectors.npy"), vectors)
+    joblib.dump(
+        {
+            "feature_cols": list(feature_cols),
+            "mean": mean,
+            "std": std,
+            "ids": ids,
+            "outcomes": outcomes,
+        },
+        os.path.join(index_dir, "meta.pkl"),
+    )
+    return SimilarityIndex(vectors, list(feature_cols), mean, std, ids, outcomes)
+
+
+def load_index(index_dir: str = INDEX_DIR) -> Optional[SimilarityIndex]:
+    """저장된 인덱스 로드 (없으면 None), 행렬은 메모리 매핑으로 읽음"""
+    vectors_path = os.path.join(index_dir, "vectors.npy")
+    meta_path = os.path.join(index_dir, "meta.pkl")
+    if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+        return None
+    meta = joblib.load(meta_path)
+    return SimilarityIndex(
+        vectors=np.load(vectors_path, mmap_mode="r"),
+        feature_cols=meta["feature_cols"],
+        mean=meta["mean"],
+        std=meta["std"],
+        ids=meta["ids"],
+        outcomes=meta["outcomes"],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the reference similarity index")
+    parser.add_argument("reference_csv")
+    parser.add_argument("--id-col", default=None)
+    parser.add_argument("--outcome-cols", nargs="*", default=[])
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    args = parser.parse_args()
+
+    feature_cols = joblib.load("feature_cols.pkl")
+    reference = pd.read_csv(args.reference_csv)
+    index = build_index(
+        reference,
+        feature_cols,
+        id_col=args.id_col,
+        outcome_cols=args.outcome_cols,
+        index_dir=args.index_dir,
+    )
+    print(f"Indexed {len(index)} reference patients → {args.index_dir}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,27 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import joblib
+import time
 import matplotlib.pyplot as plt
 import seaborn as sns
+from concurrent.futures import wait
 from datetime import datetime
 from sklearn.preprocessing import StandardScaler
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from clinical_tab import render_clinical_tab  # 두 번째 탭 렌더링 함수
+from data_quality import (
+    REFERENCE_STATS_PATH,
+    impute_medians,
+    load_reference_stats,
+    read_header,
+    scan_csv,
+)
+from patient_index import build_patient_index
+from result_store import ResultStore, content_hash, file_digest
+from scoring_pool import ScoringScheduler
+from similarity_index import load_index
+from what_if import make_deltas, run_what_if
 
 
 # -------------------------------------------------------
@@ -108,9 +123,134 @@ def load_model_and_features():
     return model, feature_cols
 
 
+@st.cache_resource
+def load_scheduler(_model):
+    # 프로세스 전체에서 하나의 worker pool을 공유 (세션별 직접 predict_proba 호출 금지)
+    return ScoringScheduler(_model)
+
+
+@st.cache_resource
+def load_result_store():
+    # 예측 결과를 디스크(SQLite)에 보관 → 새로고침/재시작 후에도 재사용
+    return ResultStore()
+
+
+@st.cache_resource
+def load_model_version() -> str:
+    return file_digest(["xgb_mm_model.pkl", "feature_cols.pkl"])
+
+
+@st.cache_resource
+def load_similarity_index():
+    # reference_index/ 가 없으면 None (similarity_index.py로 생성)
+    return load_index()
+
+
+@st.cache_resource
+def load_reference():
+    # 기준 통계(reference_stats.pkl)는 선택 사항 → 없으면 None
+    stats = load_reference_stats()
+    # 결과 저장소 key에 쓰는 median 출처 (기준 통계 파일 내용 hash 또는 코호트 median)
+    version = file_digest([REFERENCE_STATS_PATH]) if stats is not None else "cohort"
+    return stats, version
+
+
 model, feature_cols = load_model_and_features()
 if model is None or feature_cols is None:
     st.stop()
+reference_stats, reference_version = load_reference()
+result_store = load_result_store()
+model_version = load_model_version()
+scheduler = load_scheduler(model)
+similarity_index = load_similarity_index()
+
+ctx = get_script_run_ctx()
+session_id = ctx.session_id if ctx is not None else "local"
+
+
+def score_with_queue_status(X: np.ndarray) -> np.ndarray:
+    """공유 scoring 큐에 제출하고, 끝날 때까지 대기 순서/대기 시간을 갱신해서 표시"""
+    future = scheduler.submit(session_id, X)
+    status = st.empty()
+    submitted = time.monotonic()
+
+    try:
+        while not wait([future], timeout=0.5).done:
+            elapsed = time.monotonic() - submitted
+            queue = scheduler.stats()
+            ahead = scheduler.position(future)
+            if ahead is None:
+                status.caption(
+                    f"🔬 Scoring... {elapsed:.1f}s elapsed · "
+                    f"{queue['active_jobs']}/{scheduler.max_workers} workers busy"
+                )
+            else:
+                status.caption(
+                    f"⏳ Queue position {ahead + 1} · {queue['queue_depth']} jobs waiting "
+                    f"from {queue['sessions_waiting']} sessions · "
+                    f"{queue['active_jobs']}/{scheduler.max_workers} workers busy · "
+                    f"waited {elapsed:.1f}s (avg {queue['avg_wait_s']:.1f}s)"
+                )
+    finally:
+        # rerun/stop으로 스크립트가 중단되면 아직 대기 중인 작업은 큐에서 제거
+        scheduler.cancel(future)
+
+    status.caption(f"✅ Scored in {time.monotonic() - submitted:.1f}s")
+    return future.result()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def scan_upload(upload_hash: str, _uploaded):
+    # 업로드 내용 hash별로 한 번만 chunk 스캔 → 위젯 조작으로 인한 rerun에서는 재사용
+    return scan_csv(_uploaded, feature_cols, reference_stats)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_patient_index(upload_hash: str, variant: str, _result_df: pd.DataFrame):
+    # 업로드별로 한 번만 정렬·포맷 → 검색 입력 등 rerun 시에는 캐시된 인덱스 사용
+    return build_patient_index(_result_df)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_saved_batch(store_path: str, batch_id: int):
+    # 저장된 batch는 바뀌지 않으므로 batch_id별로 한 번만 읽고 정렬·포맷
+    saved_df = result_store.load_batch(batch_id)
+    return build_patient_index(saved_df).table, saved_df.to_csv(index=False).encode("utf-8")
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def find_similar_patients(
+    upload_hash: str,
+    variant: str,
+    k: int,
+    _cohort: pd.DataFrame,
+    _patient_ids: list,
+) -> pd.DataFrame:
+    # 업로드 코호트 전체의 top-k 이웃을 한 번에 계산해서 캐시
+    return similarity_index.query(_cohort, _patient_ids, k=k)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def score_what_if(
+    upload_hash: str,
+    variant: str,
+    patient_pos: int,
+    sweep_genes: tuple,
+    pair_genes: tuple,
+    max_delta: float,
+    n_steps: int,
+    _cohort: np.ndarray,
+):
+    # (업로드, 환자, perturbation 설정)별로 캐시 → 슬라이더 조작 시 재계산 최소화
+    return run_what_if(
+        lambda X: scheduler.predict_proba(session_id, X),
+        _cohort,
+        patient_pos,
+        feature_cols,
+        list(sweep_genes),
+        list(pair_genes),
+        make_deltas(max_delta, n_steps),
+    )
 
 # -------------------------------------------------------
 # 헤더
@@ -130,7 +270,9 @@ st.markdown(
 # -------------------------------------------------------
 # 탭 생성
 # -------------------------------------------------------
-tab1, tab2 = st.tabs(["📊 Predict My Sample", "📋 Clinical Interpretation"])
+tab1, tab2, tab3 = st.tabs(
+    ["📊 Predict My Sample", "📋 Clinical Interpretation", "🗂️ Result History"]
+)
 
 # =======================================================
 # 탭 1: Predict My Sample
@@ -169,25 +311,35 @@ with tab1:
 
     else:
         try:
-            user_df = pd.read_csv(uploaded)
-
             # ---------------- Data Validation ----------------
             st.markdown(
                 '<div class="section-title">✅ Data Validation</div>',
                 unsafe_allow_html=True,
             )
 
-            missing_features = set(feature_cols) - set(user_df.columns)
+            upload_hash = content_hash(uploaded.getvalue())
+
+            # 헤더만 먼저 읽어서 feature 누락은 전체 파싱 전에 바로 알려줌
+            header_cols = read_header(uploaded)
+            missing_features = set(feature_cols) - set(header_cols)
+
+            if missing_features:
+                user_df = None
+            else:
+                user_df, quality = scan_upload(upload_hash, uploaded)
 
             c1, c2, c3 = st.columns(3)
             with c1:
-                st.metric("Uploaded Samples", len(user_df))
+                st.metric(
+                    "Uploaded Samples",
+                    len(user_df) if user_df is not None else "—",
+                )
             with c2:
                 st.metric("Required Features", len(feature_cols))
             with c3:
                 st.metric(
                     "Matched Features",
-                    len(set(feature_cols) & set(user_df.columns)),
+                    len(set(feature_cols) & set(header_cols)),
                 )
 
             if missing_features:
@@ -197,7 +349,53 @@ with tab1:
                 st.stop()
 
             # extra column 경고는 아예 띄우지 않고, 그냥 feature_cols만 사용
-            st.success("✅ All required features found! Ready for prediction.")
+            st.success("✅ All required features found!")
+
+            # ---------------- Data Quality ----------------
+            variant = "raw"
+            if quality.has_issues:
+                totals = quality.totals
+                st.warning(
+                    f"⚠️ Data quality issues: {int(totals['Missing'])} missing, "
+                    f"{int(totals['Non_Numeric'])} non-numeric, "
+                    f"{int(totals['Non_Finite'])} non-finite, "
+                    f"{int(totals['Out_Of_Range'])} out-of-range values"
+                )
+                with st.expander("Show per-gene quality report"):
+                    st.dataframe(
+                        quality.problem_columns(),
+                        use_container_width=True,
+                    )
+
+                # 이미 점수가 있는 샘플 CSV는 유전자 값을 쓰지 않으므로 그대로 진행
+                if quality.imputable > 0 and not {"Risk_Score", "Risk_Group"}.issubset(
+                    user_df.columns
+                ):
+                    median_source = (
+                        "reference medians"
+                        if reference_stats is not None
+                        else "cohort medians (no reference_stats.pkl)"
+                    )
+                    impute = st.checkbox(
+                        f"Impute invalid values with {median_source}",
+                        value=False,
+                    )
+                    if impute:
+                        user_df = impute_medians(user_df, feature_cols, reference_stats)
+                        variant = f"imputed:{reference_version}"
+                        st.success(f"✅ Imputed {quality.imputable} values.")
+                    elif quality.blocking:
+                        # 숫자가 아닌 값 / inf는 모델에 넣을 수 없으므로 여기서 중단
+                        st.info(
+                            "Fix the non-numeric / non-finite values above or "
+                            "enable imputation to run prediction."
+                        )
+                        st.stop()
+                    else:
+                        # 결측값(NaN)은 기존처럼 모델의 missing value 처리에 맡김
+                        st.info("Missing values are passed to the model as-is.")
+            else:
+                st.success("✅ No missing or invalid values. Ready for prediction.")
 
             # ---------------- 예측 함수 ----------------
             def run_prediction(df: pd.DataFrame) -> pd.DataFrame:
@@ -235,7 +433,8 @@ with tab1:
                 scaler = StandardScaler()
                 X_scaled = scaler.fit_transform(df)
 
-                risk = model.predict_proba(X_scaled)[:, 1]  # 사망 확률(0~1)
+                # 공유 scoring 큐에 제출하고 결과를 기다림
+                risk = score_with_queue_status(X_scaled)  # 사망 확률(0~1)
 
                 def get_risk_group(score: float) -> str:
                     if score < 0.2:
@@ -266,7 +465,22 @@ with tab1:
                 unsafe_allow_html=True,
             )
 
-            result_df = run_prediction(user_df)
+            # 같은 파일 + 같은 모델이면 저장된 결과를 그대로 사용 (추론 생략)
+            result_df = result_store.load(upload_hash, model_version, variant)
+            if result_df is None:
+                result_df = run_prediction(user_df)
+                result_store.save(
+                    upload_hash,
+                    model_version,
+                    result_df,
+                    variant=variant,
+                    file_name=uploaded.name,
+                )
+            else:
+                st.caption("⚡ Loaded saved results for this file (no re-scoring).")
+
+            # 위험군/점수 순 정렬 + Patient_ID 인덱스를 한 번만 생성
+            patient_index = get_patient_index(upload_hash, variant, result_df)
 
             # --------- 상단 요약 카드 ---------
             c1, c2, c3, c4 = st.columns(4)
@@ -283,13 +497,7 @@ with tab1:
                 )
 
             with c2:
-                high_risk = len(
-                    result_df[
-                        result_df["Risk_Group"].isin(
-                            ["High Risk", "Very High Risk"]
-                        )
-                    ]
-                )
+                high_risk = patient_index.count("high")
                 st.markdown(
                     f"""
                     <div class="stat-card">
@@ -301,9 +509,7 @@ with tab1:
                 )
 
             with c3:
-                medium_risk = len(
-                    result_df[result_df["Risk_Group"] == "Medium Risk"]
-                )
+                medium_risk = patient_index.count("medium")
                 st.markdown(
                     f"""
                     <div class="stat-card">
@@ -315,13 +521,7 @@ with tab1:
                 )
 
             with c4:
-                low_risk = len(
-                    result_df[
-                        result_df["Risk_Group"].isin(
-                            ["Low Risk", "Very Low Risk"]
-                        )
-                    ]
-                )
+                low_risk = patient_index.count("low")
                 st.markdown(
                     f"""
                     <div class="stat-card">
@@ -560,6 +760,22 @@ with tab1:
             # --------- 위험군별 환자 리스트 ---------
             st.markdown("### ⚠️ Patient Lists by Risk Group")
 
+            # 🔍 Patient_ID 검색 (해시 인덱스 조회)
+            search_id = st.text_input(
+                "🔍 Search Patient ID",
+                placeholder="e.g. MM-001",
+            )
+            if search_id.strip():
+                found = patient_index.lookup(search_id)
+                if found is None:
+                    st.warning(f"'{search_id.strip()}' 환자를 찾을 수 없습니다.")
+                else:
+                    st.dataframe(
+                        found,
+                        use_container_width=True,
+                        hide_index=True,
+                    )
+
             subtab1, subtab2, subtab3 = st.tabs(
                 [
                     "🔴 High Risk Patients",
@@ -568,63 +784,219 @@ with tab1:
                 ]
             )
 
-            def format_patient_table(df_sub: pd.DataFrame) -> pd.DataFrame:
-                table = df_sub[
-                    ["Patient_ID", "Risk_Score", "Survival_Rate", "Risk_Group"]
-                ].copy()
-                table = table.sort_values("Risk_Score", ascending=False)
-                table["Risk_Score"] = table["Risk_Score"].apply(
-                    lambda x: f"{x:.3f}"
-                )
-                table["Survival_Rate"] = table["Survival_Rate"].apply(
-                    lambda x: f"{x:.1f}%"
-                )
-                return table
-
             # 🔴 High Risk (High + Very High)
             with subtab1:
-                high_df = result_df[
-                    result_df["Risk_Group"].isin(
-                        ["High Risk", "Very High Risk"]
-                    )
-                ]
+                high_df = patient_index.tier("high")
                 if high_df.empty:
                     st.info("현재 High / Very High Risk 환자가 없습니다.")
                 else:
                     st.dataframe(
-                        format_patient_table(high_df),
+                        high_df,
                         use_container_width=True,
                         hide_index=True,
                     )
 
             # 🟡 Medium Risk
             with subtab2:
-                med_df = result_df[result_df["Risk_Group"] == "Medium Risk"]
+                med_df = patient_index.tier("medium")
                 if med_df.empty:
                     st.info("현재 Medium Risk 환자가 없습니다.")
                 else:
                     st.dataframe(
-                        format_patient_table(med_df),
+                        med_df,
                         use_container_width=True,
                         hide_index=True,
                     )
 
             # 🟢 Low Risk (Low + Very Low)
             with subtab3:
-                low_df = result_df[
-                    result_df["Risk_Group"].isin(
-                        ["Low Risk", "Very Low Risk"]
-                    )
-                ]
+                low_df = patient_index.tier("low")
                 if low_df.empty:
                     st.info("현재 Low / Very Low Risk 환자가 없습니다.")
                 else:
                     st.dataframe(
-                        format_patient_table(low_df),
+                        low_df,
                         use_container_width=True,
                         hide_index=True,
                     )
 
+            # --------- What-if 유전자 발현 변화 ---------
+            if not {"Risk_Score", "Risk_Group"}.issubset(user_df.columns):
+                st.markdown("### 🧪 What-if Gene Perturbation")
+                st.caption(
+                    "선택한 환자의 유전자 발현을 올리거나 내렸을 때 Risk Score 변화를 계산합니다."
+                )
+
+                importances = getattr(model, "feature_importances_", None)
+                if importances is not None:
+                    default_genes = [
+                        feature_cols[k] for k in np.argsort(importances)[::-1][:3]
+                    ]
+                else:
+                    default_genes = list(feature_cols[:3])
+
+                w1, w2 = st.columns(2)
+                with w1:
+                    patient_pos = st.selectbox(
+                        "Patient",
+                        range(len(result_df)),
+                        format_func=lambda k: result_df["Patient_ID"].iloc[k],
+                    )
+                    sweep_genes = st.multiselect(
+                        "Genes to sweep",
+                        feature_cols,
+                        default=default_genes,
+                        max_selections=10,
+                    )
+                    pair_genes = st.multiselect(
+                        "Gene pair grid (select 2)",
+                        feature_cols,
+                        max_selections=2,
+                    )
+                with w2:
+                    max_delta = st.slider(
+                        "Max expression change (±)",
+                        min_value=0.5,
+                        max_value=5.0,
+                        value=2.0,
+                        step=0.5,
+                    )
+                    n_steps = st.slider(
+                        "Grid steps",
+                        min_value=5,
+                        max_value=41,
+                        value=21,
+                        step=2,
+                    )
+
+                if sweep_genes or len(pair_genes) == 2:
+                    sweep_df, pair_df = score_what_if(
+                        upload_hash,
+                        variant,
+                        patient_pos,
+                        tuple(sweep_genes),
+                        tuple(pair_genes),
+                        max_delta,
+                        n_steps,
+                        user_df[feature_cols].to_numpy(dtype=float),
+                    )
+                    baseline = result_df["Risk_Score"].iloc[patient_pos]
+
+                    p1, p2 = st.columns(2)
+
+                    # 단일 유전자 sweep
+                    with p1:
+                        if not sweep_df.empty:
+                            fig5, ax5 = plt.subplots(figsize=(8, 5))
+                            for gene in sweep_df.columns:
+                                ax5.plot(
+                                    sweep_df.index,
+                                    sweep_df[gene],
+                                    marker="o",
+                                    markersize=3,
+                                    label=gene,
+                                )
+                            ax5.axhline(
+                                y=baseline,
+                                color="gray",
+                                linestyle="--",
+                                linewidth=1,
+                                label=f"Current: {baseline:.3f}",
+                            )
+                            ax5.set_xlabel(
+                                "Expression Change",
+                                fontsize=11,
+                                fontweight="bold",
+                            )
+                            ax5.set_ylabel("Risk Score", fontsize=11, fontweight="bold")
+                            ax5.set_title(
+                                "Single-gene Sensitivity",
+                                fontsize=13,
+                                fontweight="bold",
+                                pad=15,
+                            )
+                            ax5.legend(fontsize=8)
+                            ax5.grid(True, alpha=0.3)
+                            plt.tight_layout()
+                            st.pyplot(fig5)
+
+                    # 유전자 쌍 grid
+                    with p2:
+                        if pair_df is not None:
+                            fig6, ax6 = plt.subplots(figsize=(8, 5))
+                            sns.heatmap(
+                                pair_df,
+                                ax=ax6,
+                                cmap="RdYlGn_r",
+                                vmin=0,
+                                vmax=1,
+                                xticklabels=[f"{d:+.1f}" for d in pair_df.columns],
+                                yticklabels=[f"{d:+.1f}" for d in pair_df.index],
+                                cbar_kws={"label": "Risk Score"},
+                            )
+                            ax6.invert_yaxis()
+                            ax6.set_title(
+                                "Pairwise Gene Perturbation",
+                                fontsize=13,
+                                fontweight="bold",
+                                pad=15,
+                            )
+                            plt.tight_layout()
+                            st.pyplot(fig6)
+                        elif pair_genes:
+                            st.info("유전자를 2개 선택하면 pairwise grid를 계산합니다.")
+
+            # --------- 유사 참조 환자 ---------
+            st.markdown("### 👥 Similar Reference Patients")
+
+            if similarity_index is None or len(similarity_index) == 0:
+                st.info(
+                    "참조 코호트 인덱스(reference_index/)가 없습니다. "
+                    "`python similarity_index.py reference.csv --id-col ... "
+                    "--outcome-cols ...`로 생성하세요."
+                )
+            else:
+                # 참조 코호트가 작으면 query()가 k를 n_ref로 줄이므로 같은 값으로 맞춤
+                k = min(
+                    st.slider(
+                        "Number of similar patients",
+                        min_value=1,
+                        max_value=20,
+                        value=5,
+                    ),
+                    len(similarity_index),
+                )
+                neighbors_df = find_similar_patients(
+                    upload_hash,
+                    variant,
+                    k,
+                    user_df,
+                    result_df["Patient_ID"].astype(str).tolist(),
+                )
+                st.caption(
+                    f"Reference cohort: {len(similarity_index):,} patients · "
+                    "cosine similarity of normalized gene profiles"
+                )
+
+                neighbor_pos = st.selectbox(
+                    "Show neighbours for",
+                    range(len(result_df)),
+                    format_func=lambda i: result_df["Patient_ID"].iloc[i],
+                )
+                # 환자별로 k개 행이 연속으로 저장되어 있으므로 바로 슬라이스
+                st.dataframe(
+                    neighbors_df.iloc[neighbor_pos * k : (neighbor_pos + 1) * k],
+                    use_container_width=True,
+                    hide_index=True,
+                )
+                st.download_button(
+                    label="📥 Download Similar Patients (CSV)",
+                    data=neighbors_df.to_csv(index=False).encode("utf-8"),
+                    file_name="MM_Similar_Reference_Patients.csv",
+                    mime="text/csv",
+                    use_container_width=True,
+                )
+
             # --------- 결과 다운로드 ---------
             st.markdown("### 💾 Download Results")
 
@@ -646,3 +1018,51 @@ with tab1:
 # =======================================================
 with tab2:
     render_clinical_tab()
+
+# =======================================================
+# 탭 3: Result History
+# =======================================================
+with tab3:
+    st.markdown(
+        '<div class="section-title">🗂️ Saved Prediction Results</div>',
+        unsafe_allow_html=True,
+    )
+
+    history_df = result_store.history()
+    if history_df.empty:
+        st.info("저장된 예측 결과가 없습니다.")
+    else:
+        st.dataframe(
+            history_df,
+            use_container_width=True,
+            hide_index=True,
+        )
+
+        batch_labels = {
+            row.batch_id: f"#{row.batch_id} · {row.file_name} · {row.created_at:%Y-%m-%d %H:%M}"
+            for row in history_df.itertuples(index=False)
+        }
+        # 사용자가 batch를 고르기 전에는 결과를 읽지 않음
+        batch_id = st.selectbox(
+            "Select a saved batch",
+            list(batch_labels),
+            index=None,
+            format_func=batch_labels.get,
+            placeholder="Choose a batch to reload",
+        )
+        if batch_id is not None:
+            saved_table, saved_csv = load_saved_batch(result_store.path, batch_id)
+
+            st.dataframe(
+                saved_table,
+                use_container_width=True,
+                hide_index=True,
+                height=300,
+            )
+            st.download_button(
+                label="📥 Download Saved Results (CSV)",
+                data=saved_csv,
+                file_name=f"MM_Risk_Prediction_batch{batch_id}.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
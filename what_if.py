@@ -0,0 +1,76 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+
+def make_deltas(max_delta: float, n_steps: int) -> np.ndarray:
+    """-max_delta ~ +max_delta 범위의 발현 변화량 (0 포함되도록 홀수 개)"""
+    n_steps = n_steps if n_steps % 2 == 1 else n_steps + 1
+    return np.linspace(-max_delta, max_delta, n_steps)
+
+
+def sweep_grid(base: np.ndarray, gene_idx: Sequence[int], deltas: np.ndarray) -> np.ndarray:
+    """유전자 하나씩만 바꾼 grid, shape = (len(gene_idx) * len(deltas), n_features)"""
+    n_genes, n_deltas = len(gene_idx), len(deltas)
+    grid = np.repeat(base[None, :], n_genes * n_deltas, axis=0)
+    grid[np.arange(len(grid)), np.repeat(gene_idx, n_deltas)] += np.tile(deltas, n_genes)
+    return grid
+
+
+def pair_grid(base: np.ndarray, i: int, j: int, deltas: np.ndarray) -> np.ndarray:
+    """두 유전자를 동시에 바꾼 grid, shape = (len(deltas) ** 2, n_features)"""
+    di, dj = np.meshgrid(deltas, deltas, indexing="ij")
+    grid = np.repeat(base[None, :], di.size, axis=0)
+    grid[:, i] += di.ravel()
+    grid[:, j] += dj.ravel()
+    return grid
+
+
+def run_what_if(
+    score_fn: Callable[[np.ndarray], np.ndarray],
+    cohort: np.ndarray,
+    patient_pos: int,
+    feature_cols: List[str],
+    sweep_genes: Sequence[str],
+    pair_genes: Sequence[str],
+    deltas: np.ndarray,
+) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """선택 환자의 유전자 발현을 바꿔가며 Risk Score 계산
+
+    sweep / pair grid를 모두 쌓아서 score_fn을 한 번만 호출함.
+    스케일링은 예측 때와 같이 업로드 코호트 기준 StandardScaler를 사용.
+    """
+    col_pos = {gene: k for k, gene in enumerate(feature_cols)}
+    base = cohort[patient_pos].astype(float)
+
+    blocks = []
+    if sweep_genes:
+        blocks.append(sweep_grid(base, [col_pos[g] for g in sweep_genes], deltas))
+    if len(pair_genes) == 2:
+        blocks.append(
+            pair_grid(base, col_pos[pair_genes[0]], col_pos[pair_genes[1]], deltas)
+        )
+    if not blocks:
+        return pd.DataFrame(index=deltas), None
+
+    scaler = StandardScaler().fit(cohort)
+    scores = score_fn(scaler.transform(np.vstack(blocks)))
+
+    n_deltas = len(deltas)
+    n_sweep = len(sweep_genes) * n_deltas
+    sweep_df = pd.DataFrame(
+        scores[:n_sweep].reshape(len(sweep_genes), n_deltas).T,
+        index=pd.Index(deltas, name="Delta"),
+        columns=list(sweep_genes),
+    )
+
+    pair_df = None
+    if len(pair_genes) == 2:
+        pair_df = pd.DataFrame(
+            scores[n_sweep:].reshape(n_deltas, n_deltas),
+            index=pd.Index(deltas, name=pair_genes[0]),
+            columns=pd.Index(deltas, name=pair_genes[1]),
+        )
+    return sweep_df, pair_df